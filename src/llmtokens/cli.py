@@ -1,24 +1,54 @@
 """Count tokens, lines, words, characters, and bytes in text."""
 
 import argparse
+import functools
 import json
 import os
+import re
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 # Disable HuggingFace progress bars
 os.environ["HF_HUB_DISABLE_PROGRESS_BARS"] = "1"
+# Let HF tokenizers parallelize batch encoding across threads
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "1")
 
-from huggingface_hub import hf_hub_download
-from jinja2 import Template
-from tokenizers import Tokenizer
-import tiktoken
+# huggingface_hub, tokenizers, tiktoken and jinja2 are imported where used, so that
+# --help and single-backend runs don't pay for importing all of them
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+# Optional faster JSON parser; orjson.JSONDecodeError subclasses json.JSONDecodeError
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 # Global verbose flag
 verbose = False
 
 DEFAULT_MODEL = "Qwen/Qwen2.5-0.5B"
 
+# Contents rendered to find how a template wraps a single user message
+USER_CONTENT_PROBES = ("\x00USER\x00", " \n\x00USER\x01\n ")
+
+# Word counting on UTF-8 bytes: ASCII whitespace (as str.split() sees it) maps to " ", all else to "x".
+# Non-ASCII whitespace can't be seen byte-wise, so text containing it falls back to str.split().
+_WORD_BYTES_TABLE = bytes(0x20 if i < 0x80 and chr(i).isspace() else 0x78 for i in range(256))
+_NON_ASCII_SPACE_RE = re.compile("[\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]")
+
+# Streaming input (raw mode with a file): chars per read, chunks per tokenizer call
+STREAM_CHUNK_SIZE = 1 << 20
+STREAM_BATCH_SIZE = 8
+# Text pre-tokenized whole and in chunks to check an HF pre-tokenizer is chunk-safe
+CHUNK_SAFETY_PROBE = "Hi there, it's 2024!\nfoo.bar\n\tx  y \nπ≈3.14;\n'ok'\n<|x|>\r\nend.\n\n z\nok"
+
 
 class TokenizerWrapper:
     """Wrapper to provide consistent interface for both tiktoken and HF tokenizers."""
@@ -27,33 +57,116 @@ class TokenizerWrapper:
         self.tokenizer = tokenizer
         self.is_tiktoken = is_tiktoken
 
-    def encode(self, text: str):
+    def encode(self, text: str) -> list[int]:
         if self.is_tiktoken:
-            # tiktoken returns list[int] directly
-            return TiktokenEncoding(self.tokenizer.encode(text))
+            # tiktoken returns list[int] directly. Special-token text (e.g. "<|endoftext|>")
+            # is counted as ordinary text, as in encode_many, rather than raising
+            return self.tokenizer.encode_ordinary(text)
         else:
             # HF tokenizer returns Encoding object with .ids
-            return self.tokenizer.encode(text)
+            return self.tokenizer.encode(text).ids
+
+    def encode_len(self, text: str) -> int:
+        """Count tokens in text. For HF, len() of the Encoding avoids copying ids into a Python list."""
+        if self.is_tiktoken:
+            return len(self.tokenizer.encode_ordinary(text))
+        else:
+            return len(self.tokenizer.encode(text))
+
+    def encode_many(self, texts: list[str], add_special_tokens: bool = True) -> list[list[int]]:
+        """Encode several texts in one batched (parallel) call, returning token ids per text."""
+        if self.is_tiktoken:
+            # tiktoken never adds special tokens
+            return self.tokenizer.encode_ordinary_batch(texts)
+        else:
+            encodings = self.tokenizer.encode_batch(texts, add_special_tokens=add_special_tokens)
+            return [enc.ids for enc in encodings]
+
+    @functools.cached_property
+    def chunk_safe(self) -> bool:
+        """Whether token counts add up over newline-aligned chunks (see iter_text_chunks).
+
+        True for tiktoken and for HF tokenizers built only from known position-independent
+        parts. SentencePiece-style tokenizers (Metaspace, Prepend normalizer) and ByteLevel
+        with add_prefix_space tokenize the start of each chunk differently, so they are not.
+        Split takes an arbitrary regex, so the pre-tokenizer must also split CHUNK_SAFETY_PROBE
+        the same whole and chunked.
+        """
+        if self.is_tiktoken:
+            return True
+        from tokenizers import normalizers, pre_tokenizers
+
+        safe_normalizers = (normalizers.NFC, normalizers.NFD, normalizers.NFKC, normalizers.NFKD, normalizers.Lowercase)
+        safe_pre_tokenizers = (
+            pre_tokenizers.Split,
+            pre_tokenizers.Digits,
+            pre_tokenizers.Punctuation,
+            pre_tokenizers.Whitespace,
+            pre_tokenizers.WhitespaceSplit,
+            pre_tokenizers.BertPreTokenizer,
+        )
+        try:
+            normalizer_parts = _sequence_parts(self.tokenizer.normalizer)
+            pre_tokenizer_parts = _sequence_parts(self.tokenizer.pre_tokenizer)
+        except TypeError:
+            return False  # Sequence can't be inspected (older tokenizers), assume unsafe
+        if not pre_tokenizer_parts:
+            return False  # Without a pre-tokenizer, merges may cross chunk boundaries
+        if not all(isinstance(n, safe_normalizers) for n in normalizer_parts) or not all(
+            isinstance(p, safe_pre_tokenizers) or (isinstance(p, pre_tokenizers.ByteLevel) and not p.add_prefix_space)
+            for p in pre_tokenizer_parts
+        ):
+            return False
+        pre_tokenize = self.tokenizer.pre_tokenizer.pre_tokenize_str
+        # Cut at every point _chunk_split_point() may choose
+        chunks = re.split(r"(?<=\S\n)(?=\S)", CHUNK_SAFETY_PROBE)
+        chunked = [piece for chunk in chunks for piece, _ in pre_tokenize(chunk)]
+        return chunked == [piece for piece, _ in pre_tokenize(CHUNK_SAFETY_PROBE)]
+
+
+def _sequence_parts(component) -> list:
+    """Flatten an HF normalizer/pre-tokenizer (possibly a nested Sequence) into its parts."""
+    if component is None:
+        return []
+    if type(component).__name__ != "Sequence":
+        return [component]
+    parts = []
+    i = 0
+    while True:
+        try:
+            part = component[i]
+        except IndexError:
+            return parts
+        parts.extend(_sequence_parts(part))
+        i += 1
 
 
-class TiktokenEncoding:
-    """Wrapper for tiktoken encoding results to match HF interface."""
+@functools.cache
+def tiktoken_encodings() -> frozenset[str]:
+    """Names of available tiktoken encodings."""
+    import tiktoken
 
-    def __init__(self, ids: list[int]):
-        self.ids = ids
+    return frozenset(tiktoken.list_encoding_names())
 
 
+@functools.lru_cache(maxsize=16)
 def load_tokenizer(model: str) -> tuple[TokenizerWrapper | None, str | None]:
     """Load tokenizer (try tiktoken first, then HuggingFace). Returns (tokenizer, error)."""
-    # Try tiktoken first
-    try:
-        enc = tiktoken.get_encoding(model)
-        return TokenizerWrapper(enc, is_tiktoken=True), None
-    except Exception:
-        pass  # Not a tiktoken encoding, try HuggingFace
+    # Try tiktoken first, if the name is a known encoding (HF repo ids contain "/")
+    if "/" not in model and model in tiktoken_encodings():
+        try:
+            import tiktoken
+
+            enc = tiktoken.get_encoding(model)
+            return TokenizerWrapper(enc, is_tiktoken=True), None
+        except Exception:
+            pass  # Encoding failed to load, try HuggingFace
 
     # Try HuggingFace
     try:
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
         path = hf_hub_download(model, "tokenizer.json")
         tokenizer = Tokenizer.from_file(path)
         return TokenizerWrapper(tokenizer, is_tiktoken=False), None
@@ -64,28 +177,125 @@ def load_tokenizer(model: str) -> tuple[TokenizerWrapper | None, str | None]:
         return None, error_msg
 
 
+@functools.lru_cache(maxsize=16)
 def load_chat_template(model: str) -> str | None:
     """Load chat template from model's tokenizer config."""
     try:
+        from huggingface_hub import hf_hub_download
+
         path = hf_hub_download(model, "tokenizer_config.json")
-        with open(path) as f:
-            config = json.load(f)
+        config = json_loads(Path(path).read_bytes())
         return config.get("chat_template")
     except Exception:
         return None
 
 
-def apply_chat_template(template: str, messages: list[dict]) -> tuple[str | None, str | None]:
-    """Apply Jinja2 chat template to messages. Returns (rendered, error_msg)."""
+@functools.cache
+def _jinja_env() -> "Environment":
+    """Shared Jinja2 environment, so compiled templates are reused across models and modes."""
+    from jinja2 import Environment
+
+    # Templates never change within a run, so skip reload checks
+    return Environment(
+        autoescape=False,
+        auto_reload=False,
+        cache_size=400,
+        optimized=True,
+        trim_blocks=False,
+        lstrip_blocks=False,
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_template(src: str) -> "Template":
+    """Compile a chat template source, caching the result by source string."""
+    return _jinja_env().from_string(src)
+
+
+def _render(template: str, messages: list[dict]) -> str:
+    return _compile_template(template).render(
+        messages=messages,
+        add_generation_prompt=True,
+        bos_token="",
+        eos_token="",
+    )
+
+
+def _outputs_content_verbatim(template: str) -> bool:
+    """Whether a template only uses "content" by printing it, alone or joined with + or ~.
+
+    Anything else (a test like `{% if m.content %}`, a filter, `{% set %}`) can make the
+    output depend on the content's value, which probe renders can't detect.
+    """
+    from jinja2 import nodes
+
+    def is_content(node) -> bool:
+        if isinstance(node, nodes.Getattr):
+            return node.attr == "content"
+        return isinstance(node, nodes.Getitem) and isinstance(node.arg, nodes.Const) and node.arg.value == "content"
+
+    def verbatim(node, printed: bool) -> bool:
+        if is_content(node) and not printed:
+            return False
+        # Output prints its children; string concatenation passes that on
+        keep = isinstance(node, nodes.Output) or (printed and isinstance(node, (nodes.Add, nodes.Concat)))
+        return all(verbatim(child, keep) for child in node.iter_child_nodes())
+
     try:
-        jinja_template = Template(template)
-        rendered = jinja_template.render(
-            messages=messages,
-            add_generation_prompt=True,
-            bos_token="",
-            eos_token="",
-        )
-        return rendered, None
+        return verbatim(_jinja_env().parse(template), False)
+    except Exception:
+        return False
+
+
+@functools.lru_cache(maxsize=32)
+def _user_message_affixes(template: str) -> tuple[str, str] | None:
+    """Return the (prefix, suffix) a template puts around a single user message's content.
+
+    Found by rendering probe contents and splitting at them. The second probe has
+    surrounding whitespace, so templates that strip or otherwise rewrite the content
+    give different affixes and return None (always render with Jinja2). Templates
+    that branch on the content are rejected up front, see _outputs_content_verbatim().
+    """
+    if not _outputs_content_verbatim(template):
+        return None
+    affixes = set()
+    for content in USER_CONTENT_PROBES:
+        try:
+            rendered = _render(template, [{"role": "user", "content": content}])
+        except Exception:
+            return None
+        if rendered.count(content) != 1:
+            return None
+        prefix, suffix = rendered.split(content)
+        affixes.add((prefix, suffix))
+    return affixes.pop() if len(affixes) == 1 else None
+
+
+def _is_single_user_message(messages: list[dict]) -> bool:
+    # --wrap-input no passes any JSON value through, e.g. an object
+    if not isinstance(messages, list) or len(messages) != 1 or not isinstance(messages[0], dict):
+        return False
+    message = messages[0]
+    return message.keys() == {"role", "content"} and message["role"] == "user" and isinstance(message["content"], str)
+
+
+def apply_chat_template(
+    template: str, messages: list[dict], fast_path: bool = True
+) -> tuple[str | None, str | None]:
+    """Apply Jinja2 chat template to messages. Returns (rendered, error_msg).
+
+    With `fast_path`, a single user message is wrapped in affixes cached per template.
+    Finding them takes two probe renders, so this only pays off when a template is
+    applied repeatedly (--batch, library use); pass False for a one-off render.
+    """
+    try:
+        # Fast path: a single user message is wrapped in constant text, so skip Jinja2
+        if fast_path and _is_single_user_message(messages):
+            affixes = _user_message_affixes(template)
+            if affixes is not None:
+                prefix, suffix = affixes
+                return prefix + messages[0]["content"] + suffix, None
+        return _render(template, messages), None
     except Exception as e:
         error_msg = str(e)
         if verbose:
@@ -97,7 +307,7 @@ def parse_messages(text: str, wrap_input: str) -> tuple[list[dict] | None, bool,
     """Parse input text into chat messages. Returns (messages, was_wrapped, error)."""
     if wrap_input == "no":
         try:
-            return json.loads(text), False, None
+            return json_loads(text), False, None
         except json.JSONDecodeError:
             error_msg = "Input is not valid JSON, falling back to raw"
             if verbose:
@@ -107,7 +317,7 @@ def parse_messages(text: str, wrap_input: str) -> tuple[list[dict] | None, bool,
         return [{"role": "user", "content": text}], True, None
     else:  # auto
         try:
-            parsed = json.loads(text)
+            parsed = json_loads(text)
             if isinstance(parsed, list):
                 return parsed, False, None
         except json.JSONDecodeError:
@@ -116,7 +326,291 @@ def parse_messages(text: str, wrap_input: str) -> tuple[list[dict] | None, bool,
 
 
 def count_tokens(text: str, tokenizer: TokenizerWrapper) -> int:
-    return len(tokenizer.encode(text).ids)
+    return tokenizer.encode_len(text)
+
+
+def count_words(t: str, data: bytes | None = None) -> int:
+    """Count words like len(t.split()), without building the list. `data` is the UTF-8 encoding of `t`, if known."""
+    if not t.isascii() and _NON_ASCII_SPACE_RE.search(t):
+        return len(t.split())
+    if data is None:
+        data = t.encode("utf-8")
+    # A word starts at each whitespace -> non-whitespace transition, or at the very start
+    mapped = data.translate(_WORD_BYTES_TABLE)
+    return mapped.count(b" x") + mapped.startswith(b"x")
+
+
+def text_stats(t: str, data: bytes | None = None) -> tuple[int, int, int, int]:
+    """Return (lines, words, chars, bytes) for text. `data` is the UTF-8 encoding of `t`, if known."""
+    # count_words() scans bytes anyway, so encode once and reuse the copy for the line and byte counts.
+    # "\n" is one byte in UTF-8, so scanning the bytes also beats scanning wide (UCS-2/4) str storage.
+    if data is None:
+        data = t.encode("utf-8")
+    return (data.count(b"\n"), count_words(t, data), len(t), len(data))
+
+
+def _chunk_split_point(block: str) -> int:
+    """Return the index just past the last newline with non-whitespace on both sides, or 0 if none."""
+    end = len(block) - 1
+    while (i := block.rfind("\n", 1, end)) != -1:
+        # GPT-2-style regexes match "\s+(?!\S)" before newline rules, so " \n" splits
+        # differently at the end of a chunk than mid-text; a letter after alone isn't enough
+        if not block[i - 1].isspace() and not block[i + 1].isspace():
+            return i + 1
+        end = i
+    return 0
+
+
+def iter_text_chunks(f, size: int | None = None):
+    """Yield text from a file in roughly `size`-char chunks (default STREAM_CHUNK_SIZE).
+
+    Chunks are only split right after a newline between two non-whitespace chars, so
+    words and whitespace runs (which tokenizers merge) never straddle two chunks.
+    """
+    if size is None:
+        size = STREAM_CHUNK_SIZE
+    parts = []
+    while block := f.read(size):
+        cut = _chunk_split_point(block)
+        if cut:
+            parts.append(block[:cut])
+            yield "".join(parts)
+            parts = [block[cut:]]
+        else:
+            parts.append(block)
+    if parts and parts[0]:
+        yield "".join(parts)
+
+
+def load_tokenizers(models: list[str]) -> list[tuple[TokenizerWrapper | None, str | None]]:
+    """Load tokenizers for all models concurrently. Returns load_tokenizer() results in model order."""
+    with ThreadPoolExecutor(max_workers=min(8, len(models))) as executor:
+        return list(executor.map(load_tokenizer, models))
+
+
+def stream_raw_file(
+    path: str,
+    models: list[str],
+    loaded: list[tuple[TokenizerWrapper | None, str | None]] | None = None,
+) -> list[tuple[list[tuple], tuple | None, list[str]]]:
+    """Raw-mode stats for a file read in chunks. Returns one process_model()-style outcome per model.
+
+    Stats and token counts are summed over chunks, so memory stays flat regardless of file size.
+    Special tokens (e.g. BOS) are counted once per file, not once per chunk. Token counts are
+    only exact for chunk-safe tokenizers (TokenizerWrapper.chunk_safe). `loaded` holds
+    load_tokenizers() results, if the caller already has them.
+    """
+    if loaded is None:
+        loaded = load_tokenizers(models)
+    tokenizers = {model: tokenizer for model, (tokenizer, _) in zip(models, loaded) if tokenizer is not None}
+
+    lines = words = chars = n_bytes = 0
+    tokens = {model: len(tokenizer.encode_many([""])[0]) for model, tokenizer in tokenizers.items()}
+    with open(path) as f:
+        chunks = iter_text_chunks(f)
+        while batch := list(islice(chunks, STREAM_BATCH_SIZE)):
+            for chunk in batch:
+                c_lines, c_words, c_chars, c_bytes = text_stats(chunk)
+                lines += c_lines
+                words += c_words
+                chars += c_chars
+                n_bytes += c_bytes
+            for model, tokenizer in tokenizers.items():
+                token_ids = tokenizer.encode_many(batch, add_special_tokens=False)
+                tokens[model] += sum(len(ids) for ids in token_ids)
+
+    outcomes = []
+    for model, (tokenizer, tok_err) in zip(models, loaded):
+        if tokenizer is None:
+            outcomes.append(([], None, [f"{model}: {tok_err}"]))
+        else:
+            row = (model, "raw", lines, words, chars, n_bytes, tokens[model])
+            outcomes.append(([row], (model, None, None), []))
+    return outcomes
+
+
+def _select_variants(
+    model: str,
+    template: str | None,
+    text: str,
+    messages: list[dict] | None,
+    mode: str,
+    renders: dict[str, tuple[str | None, str | None]],
+) -> tuple[list[tuple[str, str]], tuple, list[str]]:
+    """Pick the (mode, text) variants to tokenize for one model. Returns (variants, model_data_row, warnings)."""
+    warnings = []
+    variants = []
+    rendered = None
+    if mode in ("raw", "both", "both-auto"):
+        variants.append(("raw", text))
+    if messages is not None:
+        if template:
+            if template not in renders:
+                renders[template] = apply_chat_template(template, messages)
+            rendered, err = renders[template]
+            if rendered is None and mode in ("template", "both"):
+                warnings.append(f"{model} template failed to render: {err}")
+        elif mode == "template":
+            warnings.append(f"{model} has no chat template, falling back to raw")
+        elif mode == "both":
+            warnings.append(f"{model} has no chat template")
+    if rendered is not None:
+        variants.append(("template", rendered))
+        return variants, (model, template, rendered), warnings
+    if mode in ("template", "either"):
+        # No usable template, fall back to raw
+        variants.append(("raw", text))
+    return variants, (model, None, None), warnings
+
+
+def load_model(model: str, mode: str) -> tuple[TokenizerWrapper | None, str | None, str | None]:
+    """Load a model's tokenizer and, if needed, its chat template. Returns (tokenizer, error, template)."""
+    tokenizer, tok_err = load_tokenizer(model)
+    # Raw mode never uses the template, so don't download it
+    template = load_chat_template(model) if tokenizer is not None and mode != "raw" else None
+    return tokenizer, tok_err, template
+
+
+def process_model(
+    model: str,
+    text: str,
+    messages: list[dict] | None,
+    mode: str,
+    text_bytes: bytes | None = None,
+    renders: dict[str, tuple[str | None, str | None]] | None = None,
+    stats: dict[str, tuple[int, int, int, int]] | None = None,
+    loaded: tuple[TokenizerWrapper | None, str | None, str | None] | None = None,
+) -> tuple[list[tuple], tuple | None, list[str]]:
+    """Load, render, and tokenize for one model. Returns (results_rows, model_data_row, warnings).
+
+    `text_bytes` is the UTF-8 encoding of `text`, passed in so it is encoded once for all models.
+    `renders` maps template source to apply_chat_template() output, shared by models with the same template.
+    `stats` maps text to text_stats() output; only token counts depend on the model, so it can be shared too.
+    `loaded` is the load_model() result, if the caller already loaded the model.
+    """
+    if renders is None:
+        renders = {}
+    if stats is None:
+        stats = {}
+    tokenizer, tok_err, template = loaded if loaded is not None else load_model(model, mode)
+    if tokenizer is None:
+        return [], None, [f"{model}: {tok_err}"]
+
+    variants, model_data_row, warnings = _select_variants(model, template, text, messages, mode, renders)
+
+    # Tokenize all variants in a single batched call
+    token_ids = tokenizer.encode_many([t for _, t in variants])
+    rows = []
+    for (m, t), ids in zip(variants, token_ids):
+        if t not in stats:
+            stats[t] = text_stats(t, text_bytes if t is text else None)
+        rows.append((model, m, *stats[t], len(ids)))
+    return rows, model_data_row, warnings
+
+
+def parse_batch(lines: list[str]) -> tuple[list[tuple[int, str, list[dict]]], list[str]]:
+    """Parse JSONL batch input. Returns ([(line_no, text, messages)], warnings).
+
+    Each line is a JSON string (counted as text, wrapped as a user message for templates)
+    or a JSON array of messages (counted as the JSON source, like single-input mode).
+    """
+    items = []
+    warnings = []
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            value = json_loads(line)
+        except json.JSONDecodeError:
+            warnings.append(f"line {line_no}: not valid JSON, skipping")
+            continue
+        if isinstance(value, str):
+            items.append((line_no, value, [{"role": "user", "content": value}]))
+        elif isinstance(value, list):
+            items.append((line_no, line.rstrip("\n"), value))
+        else:
+            warnings.append(f"line {line_no}: expected a JSON string or array, skipping")
+    return items, warnings
+
+
+def process_model_batch(
+    model: str,
+    items: list[tuple[int, str, list[dict]]],
+    mode: str,
+    stats: dict[str, tuple[int, int, int, int]] | None = None,
+    renders: list[dict[str, tuple[str | None, str | None]]] | None = None,
+    loaded: tuple[TokenizerWrapper | None, str | None, str | None] | None = None,
+) -> tuple[list[tuple], list[str]]:
+    """Batch version of process_model(): all items are tokenized in one call. Returns (results_rows, warnings).
+
+    Rows are (line_no, model, mode, lines, words, chars, bytes, tokens). `renders` holds one
+    template -> apply_chat_template() map per item, shared by models with the same template.
+    """
+    if stats is None:
+        stats = {}
+    if renders is None:
+        renders = [{} for _ in items]
+    tokenizer, tok_err, template = loaded if loaded is not None else load_model(model, mode)
+    if tokenizer is None:
+        return [], [f"{model}: {tok_err}"]
+
+    warnings = []
+    variants = []  # (line_no, mode, text)
+    for (line_no, text, messages), item_renders in zip(items, renders):
+        item_variants, _, item_warnings = _select_variants(model, template, text, messages, mode, item_renders)
+        variants.extend((line_no, m, t) for m, t in item_variants)
+        # With a template, warnings are render failures for this line; without one, the
+        # "no chat template" warning is the same for every line and is reported once
+        warnings.extend(f"line {line_no}: {w}" if template else w for w in item_warnings)
+
+    token_ids = tokenizer.encode_many([t for _, _, t in variants])
+    rows = []
+    for (line_no, m, t), ids in zip(variants, token_ids):
+        if t not in stats:
+            stats[t] = text_stats(t)
+        rows.append((line_no, model, m, *stats[t], len(ids)))
+    return rows, list(dict.fromkeys(warnings))
+
+
+def main_batch(lines: list[str], models: list[str], mode: str) -> None:
+    """Tokenize JSONL input with every model and print one JSON object per (line, model, mode)."""
+    items, warnings = parse_batch(lines)
+    for warning in warnings:
+        print(f"Warning: {warning}", file=sys.stderr)
+
+    stats = {}
+    with ThreadPoolExecutor(max_workers=min(8, len(models))) as executor:
+        loaded_models = list(executor.map(lambda m: load_model(m, mode), models))
+        # Render each line once per distinct template, shared by all models using that template
+        templates = {template for _, _, template in loaded_models if template}
+
+        def render_item(item: tuple[int, str, list[dict]]) -> dict[str, tuple[str | None, str | None]]:
+            return {template: apply_chat_template(template, item[2]) for template in templates}
+
+        renders = list(executor.map(render_item, items))
+        outcomes = list(executor.map(
+            lambda m, lm: process_model_batch(m, items, mode, stats, renders, lm), models, loaded_models
+        ))
+
+    results = []
+    for rows, model_warnings in outcomes:
+        for warning in model_warnings:
+            print(f"Warning: {warning}", file=sys.stderr)
+        results.extend(rows)
+    if items and not results:
+        print("Error: No models could be loaded", file=sys.stderr)
+        sys.exit(1)
+
+    # Group output by input line, keeping model order within a line
+    results.sort(key=lambda r: r[0])
+    keys = ("line_no", "model", "mode", "lines", "words", "chars", "bytes", "tokens")
+    sys.stdout.write("".join(json.dumps(dict(zip(keys, row)), ensure_ascii=False) + "\n" for row in results))
+
+
+def section(title: str, body: str) -> str:
+    """Format an output section: a blank line, a banner with the centered title, then the body."""
+    banner = "=" * 60
+    return f"\n{banner}\n{title.center(60)}\n{banner}\n{body}\n"
 
 
 def main():
@@ -140,17 +634,26 @@ def main():
     parser.add_argument(
         "--wrap-input",
         choices=["yes", "no", "auto"],
-        default="auto",
         help="Wrap input as user message: yes (always wrap), no (parse as JSON messages), auto (default, try JSON then wrap)",
     )
     parser.add_argument("--show-original", action="store_true", help="Show original input text")
     parser.add_argument("--show-template", action="store_true", help="Show chat template")
     parser.add_argument("--show-rendered", action="store_true", help="Show rendered text after template")
     parser.add_argument("--show-all", action="store_true", help="Show original, template, and rendered")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Read JSONL input (one JSON string or messages array per line) and print per-line stats as JSONL; "
+        "not combinable with --wrap-input or --show-*",
+    )
     parser.add_argument("-v", "--verbose", action="store_true", help="Show full stacktrace on errors")
     parser.add_argument("file", nargs="?", help="Input file (reads stdin if not provided)")
     args = parser.parse_args()
 
+    if args.batch and (args.wrap_input or args.show_original or args.show_template or args.show_rendered or args.show_all):
+        parser.error("--batch cannot be combined with --wrap-input or --show-* options")
+    if args.wrap_input is None:
+        args.wrap_input = "auto"
     if args.show_all:
         args.show_original = args.show_template = args.show_rendered = True
 
@@ -159,11 +662,32 @@ def main():
 
     models = sorted(args.models or [DEFAULT_MODEL])
 
-    if args.file:
-        with open(args.file) as f:
-            text = f.read()
-    else:
-        text = sys.stdin.read()
+    if args.batch:
+        if args.file:
+            with open(args.file) as f:
+                lines = f.readlines()
+        else:
+            lines = sys.stdin.readlines()
+        main_batch(lines, models, args.mode)
+        return
+
+    # Raw stats are additive over chunks, so a file can be streamed unless its text is shown,
+    # as long as every tokenizer tokenizes chunks the same way as the whole text
+    loaded = None
+    stream = False
+    if args.file and args.mode == "raw" and not args.show_original:
+        loaded = load_tokenizers(models)
+        stream = all(tokenizer.chunk_safe for tokenizer, _ in loaded if tokenizer is not None)
+
+    text = text_bytes = None
+    if not stream:
+        if args.file:
+            with open(args.file) as f:
+                text = f.read()
+        else:
+            text = sys.stdin.read()
+        # Encode once; byte counts for the raw text reuse this instead of re-encoding per model
+        text_bytes = text.encode("utf-8")
 
     # Parse messages if needed (for template modes)
     messages = None
@@ -182,153 +706,79 @@ def main():
         else:
             print("Input: parsed as JSON messages")
 
-    # 2. Process models (prints warnings), collect results
+    # 2. Process models, print warnings, collect results
     results = []  # (model, mode, lines, words, chars, bytes, tokens)
     model_data = []  # (model, template, rendered)
 
-    def calc_stats(t: str, tokenizer: TokenizerWrapper) -> tuple:
-        return (t.count("\n"), len(t.split()), len(t), len(t.encode("utf-8")), count_tokens(t, tokenizer))
-
-    models.sort()
-
-    for model in models:
-        tokenizer, tok_err = load_tokenizer(model)
-        if tokenizer is None:
-            print(f"Warning: {model}: {tok_err}", file=sys.stderr)
-            continue
-        template = load_chat_template(model)
-
-        if args.mode == "raw":
-            stats = calc_stats(text, tokenizer)
-            results.append((model, "raw", *stats))
-            model_data.append((model, None, None))
-
-        elif args.mode == "template":
-            if messages is None:
-                # JSON parse failed, fall back to raw
-                stats = calc_stats(text, tokenizer)
-                results.append((model, "raw", *stats))
-                model_data.append((model, None, None))
-            elif template:
-                rendered, err = apply_chat_template(template, messages)
-                if rendered is not None:
-                    stats = calc_stats(rendered, tokenizer)
-                    results.append((model, "template", *stats))
-                    model_data.append((model, template, rendered))
-                else:
-                    print(f"Warning: {model} template failed to render: {err}", file=sys.stderr)
-                    stats = calc_stats(text, tokenizer)
-                    results.append((model, "raw", *stats))
-                    model_data.append((model, None, None))
-            else:
-                print(f"Warning: {model} has no chat template, falling back to raw", file=sys.stderr)
-                stats = calc_stats(text, tokenizer)
-                results.append((model, "raw", *stats))
-                model_data.append((model, None, None))
-
-        elif args.mode == "either":
-            if messages is None:
-                # JSON parse failed, fall back to raw
-                stats = calc_stats(text, tokenizer)
-                results.append((model, "raw", *stats))
-                model_data.append((model, None, None))
-            elif template:
-                rendered, err = apply_chat_template(template, messages)
-                if rendered is not None:
-                    stats = calc_stats(rendered, tokenizer)
-                    results.append((model, "template", *stats))
-                    model_data.append((model, template, rendered))
-                else:
-                    stats = calc_stats(text, tokenizer)
-                    results.append((model, "raw", *stats))
-                    model_data.append((model, None, None))
-            else:
-                stats = calc_stats(text, tokenizer)
-                results.append((model, "raw", *stats))
-                model_data.append((model, None, None))
-
-        elif args.mode == "both":
-            stats_raw = calc_stats(text, tokenizer)
-            results.append((model, "raw", *stats_raw))
-            if messages is None:
-                # JSON parse failed, skip template
-                model_data.append((model, None, None))
-            elif template:
-                rendered, err = apply_chat_template(template, messages)
-                if rendered is not None:
-                    stats_tpl = calc_stats(rendered, tokenizer)
-                    results.append((model, "template", *stats_tpl))
-                    model_data.append((model, template, rendered))
-                else:
-                    print(f"Warning: {model} template failed to render: {err}", file=sys.stderr)
-                    model_data.append((model, None, None))
-            else:
-                print(f"Warning: {model} has no chat template", file=sys.stderr)
-                model_data.append((model, None, None))
-
-        elif args.mode == "both-auto":
-            stats_raw = calc_stats(text, tokenizer)
-            results.append((model, "raw", *stats_raw))
-            if messages is None:
-                # JSON parse failed, skip template
-                model_data.append((model, None, None))
-            elif template:
-                rendered, err = apply_chat_template(template, messages)
-                if rendered is not None:
-                    stats_tpl = calc_stats(rendered, tokenizer)
-                    results.append((model, "template", *stats_tpl))
-                    model_data.append((model, template, rendered))
-                else:
-                    model_data.append((model, None, None))
+    if stream:
+        outcomes = stream_raw_file(args.file, models, loaded)
+    else:
+        # Models are independent (download, render, tokenize), so process them concurrently
+        with ThreadPoolExecutor(max_workers=min(8, len(models))) as executor:
+            if loaded is not None:
+                # Tokenizers were already loaded to check streaming; raw mode needs no templates
+                loaded_models = [(tokenizer, tok_err, None) for tokenizer, tok_err in loaded]
             else:
-                model_data.append((model, None, None))
+                loaded_models = list(executor.map(lambda m: load_model(m, args.mode), models))
+            # Models of one family often share a chat template, so render each distinct template once
+            renders = {}
+            if messages is not None:
+                for template in {template for _, _, template in loaded_models}:
+                    if template:
+                        # Rendered once per template here, so the probe renders of the fast path wouldn't pay off
+                        renders[template] = apply_chat_template(template, messages, fast_path=False)
+            # Non-token stats depend only on the text, so compute them once per distinct text
+            stats = {}
+            # template/either modes count the raw text only for models left without a rendered template
+            uses_raw = args.mode in ("raw", "both", "both-auto") or messages is None or any(
+                not template or renders[template][0] is None
+                for tokenizer, _, template in loaded_models
+                if tokenizer is not None
+            )
+            if uses_raw:
+                stats[text] = text_stats(text, text_bytes)
+            for rendered, _ in renders.values():
+                if rendered is not None and rendered not in stats:
+                    stats[rendered] = text_stats(rendered)
+            outcomes = list(executor.map(
+                lambda m, lm: process_model(m, text, messages, args.mode, text_bytes, renders, stats, lm),
+                models,
+                loaded_models,
+            ))
+
+    for rows, data, warnings in outcomes:
+        for warning in warnings:
+            print(f"Warning: {warning}", file=sys.stderr)
+        results.extend(rows)
+        if data is not None:
+            model_data.append(data)
 
     # 3. Stats table
     if not results:
         print("Error: No models could be loaded", file=sys.stderr)
         sys.exit(1)
 
-    print("\n" + "=" * 60)
-    print("STATS".center(60))
-    print("=" * 60)
-
-    # Calculate column widths: model, mode, lines, words, chars, bytes, tokens
+    # Stringify cells once, then size columns: model, mode, lines, words, chars, bytes, tokens
     headers = ["model", "mode", "lines", "words", "chars", "bytes", "tokens"]
-    col_widths = [
-        max(len(headers[0]), max(len(r[0]) for r in results)),
-        max(len(headers[1]), max(len(r[1]) for r in results)),
-    ]
-    for i in range(2, 7):
-        col_widths.append(max(len(headers[i]), max(len(str(r[i])) for r in results)))
-
-    # Print header
-    header_row = "  ".join(h.rjust(w) for h, w in zip(headers, col_widths))
-    print(header_row)
-    print("-" * len(header_row))
-
-    # Print rows
-    for row in results:
-        print("  ".join(str(v).rjust(w) for v, w in zip(row, col_widths)))
+    str_rows = [[str(v) for v in row] for row in results]
+    col_widths = [max(len(h), *(len(r[i]) for r in str_rows)) for i, h in enumerate(headers)]
+
+    # Build the whole table and write it at once
+    header_row = "  ".join([h.rjust(w) for h, w in zip(headers, col_widths)])
+    table = [header_row, "-" * len(header_row)]
+    table.extend("  ".join([v.rjust(w) for v, w in zip(row, col_widths)]) for row in str_rows)
+    sys.stdout.write(section("STATS", "\n".join(table)))
 
     # 4. Original (if needed)
     if args.show_original:
-        print("\n" + "=" * 60)
-        print("ORIGINAL TEXT".center(60))
-        print("=" * 60)
-        print(text)
+        sys.stdout.write(section("ORIGINAL TEXT", text))
 
     # 5. Templates and rendered per model
     for model, template, rendered in model_data:
         if args.show_template and template:
-            print("\n" + "=" * 60)
-            print(f"CHAT TEMPLATE: {model}".center(60))
-            print("=" * 60)
-            print(template)
+            sys.stdout.write(section(f"CHAT TEMPLATE: {model}", template))
         if args.show_rendered and rendered:
-            print("\n" + "=" * 60)
-            print(f"RENDERED TEXT: {model}".center(60))
-            print("=" * 60)
-            print(rendered)
+            sys.stdout.write(section(f"RENDERED TEXT: {model}", rendered))
 
 
 if __name__ == "__main__":
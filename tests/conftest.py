@@ -0,0 +1,21 @@
+"""Shared pytest fixtures for llmtokens."""
+
+import pytest
+
+from llmtokens.cli import load_tokenizer
+
+
+@pytest.fixture(scope="session")
+def cl100k_tokenizer():
+    """tiktoken cl100k_base tokenizer, loaded once per test session."""
+    tokenizer, error = load_tokenizer("cl100k_base")
+    assert tokenizer is not None, error
+    return tokenizer
+
+
+@pytest.fixture(scope="session")
+def qwen_tokenizer():
+    """HuggingFace Qwen/Qwen2.5-0.5B tokenizer, loaded once per test session."""
+    tokenizer, error = load_tokenizer("Qwen/Qwen2.5-0.5B")
+    assert tokenizer is not None, error
+    return tokenizer
@@ -1,14 +1,25 @@
 """Basic smoke tests for llmtokens."""
 
 import io
+import json
 import sys
 import pytest
 
 from llmtokens.cli import (
     load_tokenizer,
+    tiktoken_encodings,
     count_tokens,
     parse_messages,
+    parse_batch,
     apply_chat_template,
+    text_stats,
+    count_words,
+    iter_text_chunks,
+    stream_raw_file,
+    TokenizerWrapper,
+    _compile_template,
+    _NON_ASCII_SPACE_RE,
+    process_model,
     main,
 )
 
@@ -45,26 +56,162 @@ class TestTokenizerLoading:
         assert error is not None
         assert "Failed to load tokenizer" in error
 
+    def test_tiktoken_encodings(self):
+        """Test known tiktoken encoding names are listed."""
+        encodings = tiktoken_encodings()
+        assert "cl100k_base" in encodings
+        assert "gpt2" in encodings
+        assert "Qwen/Qwen2.5-0.5B" not in encodings
+
+    def test_load_tokenizer_is_cached(self):
+        """Test that repeated loads reuse the same tokenizer."""
+        first, _ = load_tokenizer("cl100k_base")
+        second, _ = load_tokenizer("cl100k_base")
+        assert first is not None
+        assert first is second
+
 
 class TestTokenCounting:
     """Test basic token counting functionality."""
 
-    def test_count_tokens_tiktoken(self):
+    def test_count_tokens_tiktoken(self, cl100k_tokenizer):
         """Test counting tokens with tiktoken."""
-        tokenizer, _ = load_tokenizer("cl100k_base")
-        assert tokenizer is not None
-
-        count = count_tokens("hello world", tokenizer)
+        count = count_tokens("hello world", cl100k_tokenizer)
         assert count == 2
 
-    def test_count_tokens_hf(self):
+    def test_count_tokens_hf(self, qwen_tokenizer):
         """Test counting tokens with HuggingFace tokenizer."""
-        tokenizer, _ = load_tokenizer("Qwen/Qwen2.5-0.5B")
-        assert tokenizer is not None
-
-        count = count_tokens("hello world", tokenizer)
+        count = count_tokens("hello world", qwen_tokenizer)
         assert count == 2  # Qwen tokenizes this as 2 tokens
 
+    def test_encode_many_matches_encode(self, cl100k_tokenizer, qwen_tokenizer):
+        """Test that batched encoding matches per-text encoding."""
+        texts = ["hello world", "What is 2+2?", "end<|endoftext|>"]
+        for tokenizer in (cl100k_tokenizer, qwen_tokenizer):
+            assert tokenizer.encode_many(texts) == [tokenizer.encode(t) for t in texts]
+
+    def test_special_token_text_tiktoken(self, cl100k_tokenizer):
+        """Test tiktoken counts special-token text as ordinary text on every path."""
+        text = "end<|endoftext|>"
+        ordinary = cl100k_tokenizer.encode(text)
+
+        assert len(ordinary) > 2  # not a single <|endoftext|> token
+        assert cl100k_tokenizer.encode_many([text]) == [ordinary]
+        assert cl100k_tokenizer.encode_len(text) == len(ordinary)
+        assert count_tokens(text, cl100k_tokenizer) == len(ordinary)
+
+    def test_encode_len_matches_encode(self, cl100k_tokenizer, qwen_tokenizer):
+        """Test that encode_len counts the ids returned by encode."""
+        for tokenizer in (cl100k_tokenizer, qwen_tokenizer):
+            assert tokenizer.encode_len("What is 2+2?") == len(tokenizer.encode("What is 2+2?"))
+
+
+class TestStats:
+    """Test text statistics."""
+
+    def test_text_stats_ascii(self):
+        """Test stats for ASCII text."""
+        assert text_stats("hello world\nfoo\n") == (2, 3, 16, 16)
+
+    def test_text_stats_non_ascii(self):
+        """Test that bytes are counted in UTF-8, not characters."""
+        assert text_stats("héllo wörld\n") == (1, 2, 12, 14)
+
+    def test_count_words_matches_split(self):
+        """Test word counts match str.split(), including unusual whitespace."""
+        texts = [
+            "",
+            "   ",
+            "hello",
+            "  hello  world  ",
+            "a\tb\nc\rd\x0be\x0cf\x1cg\x1fh",
+            "héllo wörld 你好",
+            "non\xa0breaking\u3000space\u2028line",
+        ]
+        for text in texts:
+            assert count_words(text) == len(text.split()), repr(text)
+
+    def test_non_ascii_whitespace_pattern(self):
+        """Test the non-ASCII whitespace pattern covers exactly what str.split() splits on."""
+        for code in range(0x80, 0x3001):
+            char = chr(code)
+            assert bool(_NON_ASCII_SPACE_RE.match(char)) == char.isspace(), hex(code)
+
+
+class TestStreaming:
+    """Test chunked reading of large inputs."""
+
+    def test_iter_text_chunks_splits_at_line_starts(self):
+        """Test chunks rejoin to the input and only split before non-blank lines."""
+        text = "alpha beta\n\n  gamma\ndelta\n" * 50
+
+        chunks = list(iter_text_chunks(io.StringIO(text), size=16))
+
+        assert "".join(chunks) == text
+        assert len(chunks) > 1
+        for chunk in chunks[1:]:
+            assert not chunk[0].isspace()
+        for chunk in chunks[:-1]:
+            assert chunk.endswith("\n")
+
+    def test_iter_text_chunks_empty(self):
+        """Test empty input yields no chunks."""
+        assert list(iter_text_chunks(io.StringIO(""))) == []
+
+    def test_chunk_safe(self):
+        """Test only position-independent HF tokenizers are considered chunk-safe."""
+        from tokenizers import Regex, Tokenizer, models, normalizers, pre_tokenizers
+
+        def wrap(pre_tokenizer, normalizer=None):
+            tokenizer = Tokenizer(models.BPE())
+            tokenizer.pre_tokenizer = pre_tokenizer
+            if normalizer is not None:
+                tokenizer.normalizer = normalizer
+            return TokenizerWrapper(tokenizer, is_tiktoken=False)
+
+        byte_level = pre_tokenizers.ByteLevel(add_prefix_space=False)
+        assert wrap(byte_level).chunk_safe
+        assert wrap(pre_tokenizers.Sequence([pre_tokenizers.Digits(), byte_level]), normalizers.NFC()).chunk_safe
+        assert not wrap(pre_tokenizers.ByteLevel(add_prefix_space=True)).chunk_safe
+        assert not wrap(pre_tokenizers.Metaspace(prepend_scheme="first")).chunk_safe
+        assert not wrap(byte_level, normalizers.Sequence([normalizers.Prepend("▁"), normalizers.NFC()])).chunk_safe
+        # A Split regex that matches across newlines is caught by the probe
+        assert not wrap(pre_tokenizers.Split(Regex(r"[\s\S]+"), "isolated")).chunk_safe
+
+    @pytest.mark.parametrize("model", ["cl100k_base", "gpt2", "Qwen/Qwen2.5-0.5B"])
+    def test_stream_matches_full_read(self, model, monkeypatch, tmp_path):
+        """Test streaming over many small chunks gives the same row as reading the whole file."""
+        text = "The quick brown fox\n\n  jumps over \nthe lazy dog. Привет, мир!\n" * 40
+        path = tmp_path / "input.txt"
+        path.write_text(text)
+        monkeypatch.setattr("llmtokens.cli.STREAM_CHUNK_SIZE", 32)
+
+        streamed, _, _ = stream_raw_file(str(path), [model])[0]
+        rows, _, _ = process_model(model, text, None, "raw")
+
+        assert rows
+        assert streamed == rows
+
+    def test_stream_trailing_space_before_newline(self, monkeypatch, tmp_path):
+        """Test a " \\n" merge isn't split at a chunk end, where GPT-2-style regexes keep it whole."""
+        from tokenizers import Tokenizer, models, pre_tokenizers
+
+        alphabet = pre_tokenizers.ByteLevel.alphabet()
+        vocab = {c: i for i, c in enumerate(sorted(alphabet))}
+        vocab["ĠĊ"] = len(vocab)
+        tokenizer = Tokenizer(models.BPE(vocab, [("Ġ", "Ċ")]))
+        tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+        wrapper = TokenizerWrapper(tokenizer, is_tiktoken=False)
+        assert wrapper.chunk_safe
+
+        text = "a \nfoo\nbar \nbaz\n" * 20
+        path = tmp_path / "input.txt"
+        path.write_text(text)
+        monkeypatch.setattr("llmtokens.cli.STREAM_CHUNK_SIZE", 8)
+
+        (streamed, _, _) = stream_raw_file(str(path), ["toy"], loaded=[(wrapper, None)])[0]
+        assert streamed[0][-1] == wrapper.encode_len(text)
+
 
 class TestMessageParsing:
     """Test message parsing with different wrap modes."""
@@ -111,6 +258,30 @@ class TestMessageParsing:
         assert error is not None
 
 
+class TestBatchParsing:
+    """Test JSONL batch input parsing."""
+
+    def test_parse_batch(self):
+        """Test strings are wrapped, arrays kept, and bad lines skipped with warnings."""
+        lines = [
+            '"hello"\n',
+            '\n',
+            '[{"role": "user", "content": "test"}]\n',
+            '42\n',
+            'not json\n',
+        ]
+
+        items, warnings = parse_batch(lines)
+
+        assert items == [
+            (1, "hello", [{"role": "user", "content": "hello"}]),
+            (3, '[{"role": "user", "content": "test"}]', [{"role": "user", "content": "test"}]),
+        ]
+        assert len(warnings) == 2
+        assert "line 4" in warnings[0]
+        assert "line 5" in warnings[1]
+
+
 class TestChatTemplate:
     """Test chat template functionality."""
 
@@ -134,6 +305,61 @@ class TestChatTemplate:
         assert rendered is None
         assert error is not None
 
+    def test_apply_template_single_user_message(self):
+        """Test the single-user-message fast path matches a full render."""
+        template = (
+            "{% for m in messages %}<|im_start|>{{ m.role }}\n{{ m.content }}<|im_end|>\n{% endfor %}"
+            "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+        )
+        messages = [{"role": "user", "content": "What is 2+2?"}]
+
+        rendered, error = apply_chat_template(template, messages)
+
+        assert rendered == "<|im_start|>user\nWhat is 2+2?<|im_end|>\n<|im_start|>assistant\n"
+        assert error is None
+
+    def test_apply_template_transforming_content(self):
+        """Test templates that rewrite the content are still rendered with Jinja2."""
+        template = "[{{ messages[0].content | trim }}]"
+        messages = [{"role": "user", "content": "  test  "}]
+
+        rendered, error = apply_chat_template(template, messages)
+
+        assert rendered == "[test]"
+        assert error is None
+
+    def test_apply_template_non_list_messages(self):
+        """Test JSON objects (from --wrap-input no) are rendered, not rejected by the fast path."""
+        rendered, error = apply_chat_template("{{ messages.a }}", {"a": 1})
+
+        assert rendered == "1"
+        assert error is None
+
+    def test_apply_template_without_fast_path(self):
+        """Test disabling the fast path gives the same rendering."""
+        template = "<s>{{ messages[0].content }}</s>"
+        messages = [{"role": "user", "content": "test"}]
+
+        assert apply_chat_template(template, messages, fast_path=False) == apply_chat_template(template, messages)
+
+    @pytest.mark.parametrize("template", [
+        "{% for m in messages %}{% if m.content %}<u>{{ m.content }}</u>{% else %}<empty/>{% endif %}{% endfor %}",
+        "{% for m in messages %}{% if m.content|length > 20 %}[long]{% endif %}{{ m.content }}{% endfor %}",
+    ])
+    def test_apply_template_content_dependent(self, template):
+        """Test templates branching on the content's value skip the fast path."""
+        for content in ["", "short", "x" * 30]:
+            messages = [{"role": "user", "content": content}]
+            assert apply_chat_template(template, messages) == apply_chat_template(template, messages, fast_path=False)
+
+        assert apply_chat_template(template, [{"role": "user", "content": ""}])[0] != "<u></u>"
+
+    def test_compiled_template_is_cached(self):
+        """Test that the same template source is compiled only once."""
+        template = "{{ messages[0].content }}!"
+
+        assert _compile_template(template) is _compile_template(template)
+
 
 class TestCLI:
     """Test CLI end-to-end."""
@@ -175,6 +401,24 @@ class TestCLI:
         assert "raw" in captured.out
         assert "2" in captured.out  # 2 tokens
 
+    def test_main_raw_mode_file(self, monkeypatch, capsys, tmp_path):
+        """Test main() streams a file in raw mode."""
+        path = tmp_path / "input.txt"
+        path.write_text("hello world\n")
+        monkeypatch.setattr("sys.argv", [
+            "llmtokens",
+            "-m", "cl100k_base",
+            "--mode", "raw",
+            str(path),
+        ])
+
+        main()
+
+        captured = capsys.readouterr()
+        assert "cl100k_base" in captured.out
+        assert "raw" in captured.out
+        assert "12" in captured.out  # 12 chars/bytes
+
     def test_main_template_mode(self, monkeypatch, capsys):
         """Test main() with template mode."""
         monkeypatch.setattr("sys.stdin", io.StringIO("What is 2+2?"))
@@ -206,6 +450,71 @@ class TestCLI:
         assert "cl100k_base" in captured.out
         assert "o200k_base" in captured.out
 
+    def test_process_model_collects_warnings(self):
+        """Test process_model() returns warnings instead of printing them."""
+        rows, data, warnings = process_model("invalid-model-12345", "test", None, "raw")
+
+        assert rows == []
+        assert data is None
+        assert len(warnings) == 1
+        assert "invalid-model-12345" in warnings[0]
+
+    def test_main_batch_mode(self, monkeypatch, capsys):
+        """Test main() with JSONL batch input."""
+        monkeypatch.setattr("sys.stdin", io.StringIO('"hello world"\n"test"\n'))
+        monkeypatch.setattr("sys.argv", [
+            "llmtokens",
+            "-m", "cl100k_base",
+            "--mode", "raw",
+            "--batch",
+        ])
+
+        main()
+
+        captured = capsys.readouterr()
+        rows = [json.loads(line) for line in captured.out.splitlines()]
+        assert [r["line_no"] for r in rows] == [1, 2]
+        assert rows[0]["model"] == "cl100k_base"
+        assert rows[0]["tokens"] == 2  # 2 tokens for "hello world"
+
+    def test_main_batch_template_mode(self, monkeypatch, capsys):
+        """Test --batch renders templates the same as single-input mode does per input."""
+        from tokenizers import Tokenizer, models, pre_tokenizers
+
+        # One token per byte, so any difference in the render changes the count
+        alphabet = sorted(pre_tokenizers.ByteLevel.alphabet())
+        tokenizer = Tokenizer(models.BPE({c: i for i, c in enumerate(alphabet)}, []))
+        tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+        template = "{% for m in messages %}<|{{ m.role }}|>{% if m.content %}{{ m.content }}{% else %}<empty/>{% endif %}{% endfor %}"
+        monkeypatch.setattr("llmtokens.cli.load_tokenizer", lambda model: (TokenizerWrapper(tokenizer, False), None))
+        monkeypatch.setattr("llmtokens.cli.load_chat_template", lambda model: template)
+
+        inputs = ["", "hello world", [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hi"}]]
+        monkeypatch.setattr("sys.stdin", io.StringIO("".join(json.dumps(i) + "\n" for i in inputs)))
+        monkeypatch.setattr("sys.argv", ["llmtokens", "-m", "local", "--mode", "template", "--batch"])
+
+        main()
+
+        rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [r["line_no"] for r in rows] == [1, 2, 3]
+        for row, item in zip(rows, inputs):
+            text = item if isinstance(item, str) else json.dumps(item)
+            messages = [{"role": "user", "content": item}] if isinstance(item, str) else item
+            # As in single-input mode, which renders with Jinja2 before process_model()
+            renders = {template: apply_chat_template(template, messages, fast_path=False)}
+            (expected,), _, _ = process_model("local", text, messages, "template", renders=renders)
+            assert (row["model"], row["mode"], row["tokens"]) == (expected[0], expected[1], expected[-1])
+
+    def test_main_batch_rejects_show_options(self, monkeypatch):
+        """Test --batch refuses options it can't honor."""
+        monkeypatch.setattr("sys.stdin", io.StringIO('"test"\n'))
+        monkeypatch.setattr("sys.argv", ["llmtokens", "--batch", "--show-rendered"])
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+        assert exc_info.value.code == 2
+
     def test_main_invalid_model(self, monkeypatch, capsys):
         """Test main() with invalid model shows warning."""
         monkeypatch.setattr("sys.stdin", io.StringIO("test"))